@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, send_from_directory
 import os
 import json
 import threading
@@ -8,6 +8,8 @@ import sys
 import uuid
 import shutil
 from auto_note_generator import DEVICE, COMPUTE_TYPE, transcribe_audio_with_faster_whisper, process_and_generate_final_note
+from note_index import get_index
+from note_render import NoteRenderCache, SLIDES_PER_PAGE, OUTPUT_DIR, supported_encodings
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 
@@ -17,6 +19,9 @@ notes_storage = {}
 # 进度状态存储
 progress_status = {}
 
+# 笔记渲染缓存
+note_cache = NoteRenderCache()
+
 def run_command(command, description):
     """运行命令并更新进度"""
     print(f"--- 正在执行: {description} ---")
@@ -155,7 +160,9 @@ def process_video_background(video_url, task_id):
         notes_storage[note_id] = {
             'id': note_id,
             'video_url': video_url,
-            'notes': '视频处理完成，请查看output目录中的生成文件'
+            'title': safe_title,
+            'html_url': f'/notes/{safe_title}',
+            'markdown_url': f'/notes/{safe_title}/raw'
         }
         
     except Exception as e:
@@ -278,6 +285,44 @@ def get_note(note_id):
             'error': 'Note not found'
         }), 404
 
+def note_response(title, fmt):
+    """返回笔记内容，支持 ETag/Last-Modified 条件请求和 br/gzip 压缩"""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', SLIDES_PER_PAGE, type=int)  # 只接受 PAGE_SIZES 中的取值
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    result = note_cache.get(title, fmt, page=page, per_page=per_page, encoding=encoding)
+    if result is None:
+        return jsonify({
+            'success': False,
+            'error': 'Note not found'
+        }), 404
+
+    body, etag, mtime, content_encoding = result
+    mimetype = 'text/markdown' if fmt == 'md' else 'text/html'
+    response = app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.last_modified = mtime
+    response.cache_control.no_cache = True  # 允许缓存，但每次都要用ETag重新验证
+    response.vary.add('Accept-Encoding')
+    if content_encoding:
+        response.content_encoding = content_encoding
+    return response.make_conditional(request)
+
+@app.route('/notes/<title>', methods=['GET'])
+def view_note(title):
+    """以HTML形式查看笔记，长笔记按幻灯片分页"""
+    return note_response(title, 'html')
+
+@app.route('/notes/<title>/raw', methods=['GET'])
+def raw_note(title):
+    """获取笔记的原始Markdown"""
+    return note_response(title, 'md')
+
+@app.route('/notes/images/<path:filename>', methods=['GET'])
+def note_image(filename):
+    """笔记中的PPT图片，支持条件请求和Range请求"""
+    return send_from_directory(os.path.abspath(os.path.join(OUTPUT_DIR, 'images')), filename, max_age=86400)
+
 @app.route('/api/notes', methods=['GET'])
 def list_notes():
     return jsonify({
@@ -285,6 +330,30 @@ def list_notes():
         'data': list(notes_storage.values())
     })
 
+@app.route('/api/search', methods=['GET'])
+def search_notes():
+    """在所有笔记的讲稿中全文搜索，返回命中的幻灯片"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': '请提供搜索关键词'
+        }), 400
+
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    start = time.perf_counter()
+    total, results = get_index().search(query, limit=limit, offset=offset)
+    return jsonify({
+        'success': True,
+        'data': {
+            'query': query,
+            'total': total,
+            'results': results,
+            'took_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+    })
+
 if __name__ == '__main__':
     # 确保模板和静态文件目录存在
     os.makedirs('templates', exist_ok=True)
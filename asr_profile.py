@@ -0,0 +1,85 @@
+import os
+import json
+import socket
+
+# 全局配置区
+# 每台主机的转录配置档案保存在此目录下，文件名为 <主机名>.json
+ASR_PROFILE_DIR = "asr_profiles"
+CALIBRATION_BEAM_SIZES = [1, 5]
+# 流水线与校准共用的转录参数，保证档案里的实时率和实际转录走同一条解码路径
+ASR_TRANSCRIBE_OPTIONS = {"language": "zh", "word_timestamps": True}
+
+
+# 选择档案时的目标：实时率上限（转录耗时/音频时长）和峰值内存上限(MB)，留空表示不限制
+def parse_asr_target(name):
+    value = os.getenv(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        print(f"警告: 环境变量 {name}={value!r} 不是有效数字，将忽略该目标。")
+        return None
+
+ASR_MAX_RTF = parse_asr_target("ASR_MAX_RTF")
+ASR_MAX_MEMORY_MB = parse_asr_target("ASR_MAX_MEMORY_MB")
+
+
+def asr_profile_path():
+    return os.path.join(ASR_PROFILE_DIR, f"{socket.gethostname()}.json")
+
+
+def asr_candidate_configs(model_paths, cuda_available, cpu_count=None):
+    """生成校准候选配置。流水线一次只转录一个文件，所以 num_workers 固定为1，不参与扫描。"""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    hardware = [("cpu", compute_type, threads)
+                for compute_type in ("int8", "float32")
+                for threads in sorted({0, max(1, cpu_count // 2), cpu_count})]
+    if cuda_available:
+        hardware += [("cuda", compute_type, 0) for compute_type in ("float16", "int8_float16")]
+    for model_name, model_path in model_paths.items():
+        if not os.path.exists(model_path):
+            print(f"警告: 跳过模型 {model_name}，路径不存在: {model_path}")
+            continue
+        for device, compute_type, cpu_threads in hardware:
+            for beam_size in CALIBRATION_BEAM_SIZES:
+                yield {"model": model_name, "model_path": model_path, "device": device,
+                       "compute_type": compute_type, "cpu_threads": cpu_threads,
+                       "num_workers": 1, "beam_size": beam_size}
+
+
+def save_asr_profile(profile):
+    os.makedirs(ASR_PROFILE_DIR, exist_ok=True)
+    with open(asr_profile_path(), 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+
+
+def select_asr_profile(cuda_available, max_rtf=ASR_MAX_RTF, max_memory_mb=ASR_MAX_MEMORY_MB):
+    """从本机档案中选出满足速度/内存目标的最快配置；没有档案时返回None。
+
+    优先满足内存目标：能放进内存的配置里没有达到速度目标的，就用其中最快的；
+    连内存目标都没有配置能满足时，才退而使用峰值内存最小的配置。
+    """
+    try:
+        with open(asr_profile_path(), 'r', encoding='utf-8') as f:
+            results = json.load(f)["results"]
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+    # 旧档案可能含有多worker的配置，单文件转录用不上
+    results = [r for r in results if r.get("num_workers", 1) == 1 and os.path.exists(r["model_path"])
+               and (r["device"] != "cuda" or cuda_available)]
+    if not results:
+        return None
+
+    if max_memory_mb is not None and any(r["peak_memory_mb"] is None for r in results):
+        print("警告: 档案中部分配置没有记录峰值内存（校准时未安装psutil），这些配置不受内存目标约束。")
+    fits_memory = [r for r in results if max_memory_mb is None or r["peak_memory_mb"] is None
+                   or r["peak_memory_mb"] <= max_memory_mb]
+    if fits_memory:
+        fast_enough = [r for r in fits_memory if max_rtf is None or r["rtf"] <= max_rtf]
+        if not fast_enough:
+            print(f"警告: 没有配置满足速度目标 RTF<={max_rtf}，将使用满足内存目标的配置中最快的一个。")
+        return min(fast_enough or fits_memory, key=lambda r: r["rtf"])
+
+    print(f"警告: 没有配置满足内存目标 {max_memory_mb}MB，将使用峰值内存最小的配置。")
+    return min(results, key=lambda r: r["peak_memory_mb"])
@@ -5,10 +5,21 @@ import subprocess
 import time
 import uuid
 import json
+import socket
+import threading
+import concurrent.futures
 import torch
+import numpy as np
 import difflib # 确保difflib被导入
 from openai import OpenAI
+from note_index import index_note
+from asr_profile import (ASR_TRANSCRIBE_OPTIONS, asr_candidate_configs, asr_profile_path,
+                         save_asr_profile, select_asr_profile)
 from faster_whisper import WhisperModel
+try:
+    import psutil # 可选，用于记录CPU配置的峰值内存
+except ImportError:
+    psutil = None
 
 # 全局配置区 
 FFMPEG_PATH = "ffmpeg"
@@ -17,6 +28,8 @@ API_KEY = os.getenv("SILICON_CLOUD_API_KEY")
 BASE_URL = "https://api.siliconflow.cn/v1"
 MODEL_NAME = "Qwen/Qwen3-30B-A3B-Thinking-2507"
 FASTER_WHISPER_MODEL_PATH = r"C:\Users\ZzZz\.cache\modelscope\hub\models\angelala00\faster-whisper-small" # 请确保路径正确
+# 参与校准的候选模型（名称 -> 本地路径），不存在的路径会被跳过
+FASTER_WHISPER_MODEL_PATHS = {"small": FASTER_WHISPER_MODEL_PATH}
 
 # --- [修正] 将环境检查和变量定义移到模块顶层 ---
 print("--- 正在初始化模块并检查运行环境 ---")
@@ -212,20 +225,158 @@ def process_and_generate_final_note(image_dir, transcript_data, video_title):
 
     print(f"🎉 最终任务完成！精炼版笔记已成功生成于: {final_md_path}")
 
+    try:
+        index_note(final_md_path)
+        print("--- 搜索索引已更新 ---")
+    except Exception as e:
+        print(f"警告: 更新搜索索引失败 ({e})，可稍后运行 python note_index.py 重建。")
+
+# --- 转录配置校准（档案的读取与选择见 asr_profile.py）---
+CALIBRATION_CLIP_SECONDS = 30
+
+def make_calibration_clip(audio_path=None):
+    """返回16kHz单声道float32音频。给定音频文件时截取开头一段，否则合成一段类语音信号。"""
+    if audio_path:
+        from faster_whisper import decode_audio
+        return decode_audio(audio_path, sampling_rate=16000)[:CALIBRATION_CLIP_SECONDS * 16000]
+    sr = 16000
+    t = np.arange(CALIBRATION_CLIP_SECONDS * sr) / sr
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)  # 缓慢变化的基频
+    phase = 2 * np.pi * np.cumsum(pitch) / sr
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)  # 约每秒4个音节
+    rng = np.random.default_rng(0)
+    audio = 0.3 * voiced * syllables + 0.01 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+def _current_memory_mb(device):
+    if device == "cuda":
+        free, total = torch.cuda.mem_get_info()
+        return (total - free) / 1024 ** 2
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    return None
+
+def _benchmark_asr_config(config, audio, decode_options, concurrency=1):
+    """加载模型，用 concurrency 个线程同时转录片段，返回实时率（并发时为按总音频计的吞吐实时率）与峰值内存增量。"""
+    baseline = _current_memory_mb(config["device"])
+    peak = [baseline]
+    stop = threading.Event()
+
+    def sample_memory():
+        while not stop.wait(0.05):
+            peak[0] = max(peak[0], _current_memory_mb(config["device"]))
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    if baseline is not None:
+        sampler.start()
+    try:
+        load_start = time.perf_counter()
+        model = WhisperModel(config["model_path"], device=config["device"], compute_type=config["compute_type"],
+                             cpu_threads=config["cpu_threads"], num_workers=concurrency)
+        load_seconds = time.perf_counter() - load_start
+
+        def transcribe_once():
+            segments, _ = model.transcribe(audio, beam_size=config["beam_size"], **decode_options)
+            # segments是惰性生成器，必须消费完才会真正解码
+            if not list(segments):
+                raise RuntimeError("转录没有产生任何语音段")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            futures = [executor.submit(transcribe_once) for _ in range(concurrency)]
+            for future in futures:
+                future.result()  # 重新抛出工作线程中的异常
+            elapsed = time.perf_counter() - start
+        del model
+    finally:
+        stop.set()
+        if sampler.is_alive():
+            sampler.join()
+
+    return {
+        "rtf": round(elapsed / (len(audio) / 16000 * concurrency), 4),
+        "peak_memory_mb": round(peak[0] - baseline, 1) if baseline is not None else None,
+        "load_seconds": round(load_seconds, 2),
+    }
+
+def calibrate_asr_profiles(audio_path=None, concurrency=None):
+    """在候选配置上测量单路实时率和峰值内存，并保存为本机的转录配置档案。
+
+    给出 concurrency 时，另外用最快的配置测一次多路并发的吞吐，仅作为参考记录在档案中。
+    """
+    print("\n--- 正在校准 faster-whisper 转录配置 ---")
+    audio = make_calibration_clip(audio_path)
+    decode_options = dict(ASR_TRANSCRIBE_OPTIONS)
+    if not audio_path:
+        # 合成片段不是真实语音，默认的静音跳过可能把它整段丢掉；真实音频则与流水线完全一致
+        decode_options["no_speech_threshold"] = None
+        print("提示: 使用合成片段并关闭了静音跳过，与实际转录的解码路径略有不同；用真实音频校准结果更准确。")
+    if psutil is None:
+        print("警告: 未安装psutil，CPU配置的峰值内存将不会被记录。")
+    results = []
+    for config in asr_candidate_configs(FASTER_WHISPER_MODEL_PATHS, torch.cuda.is_available()):
+        print(f"正在测试: {config['model']} {config['device']}/{config['compute_type']} "
+              f"threads={config['cpu_threads']} beam={config['beam_size']} ...", end="")
+        try:
+            config.update(_benchmark_asr_config(config, audio, decode_options))
+        except Exception as e:
+            print(f" 失败: {e}")
+            continue
+        print(f" RTF={config['rtf']} 峰值内存={config['peak_memory_mb']}MB")
+        results.append(config)
+    if not results:
+        print("!!! 错误: 没有任何配置校准成功，未生成档案。")
+        return None
+
+    results.sort(key=lambda r: r["rtf"])
+    profile = {
+        "host": socket.gethostname(),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "clip": audio_path or "synthetic",
+        "clip_seconds": round(len(audio) / 16000, 2),
+        "decode_options": decode_options,
+        "results": results,
+    }
+    if concurrency and concurrency > 1:
+        best = results[0]
+        print(f"正在测试 {concurrency} 路并发吞吐 ({best['model']} {best['device']}/{best['compute_type']}) ...", end="")
+        try:
+            measured = _benchmark_asr_config(best, audio, decode_options, concurrency=concurrency)
+            profile["concurrency"] = {"num_workers": concurrency, "throughput_rtf": measured["rtf"],
+                                      "peak_memory_mb": measured["peak_memory_mb"],
+                                      "config": {k: best[k] for k in ("model", "device", "compute_type", "cpu_threads", "beam_size")}}
+            print(f" 吞吐RTF={measured['rtf']} 峰值内存={measured['peak_memory_mb']}MB")
+        except Exception as e:
+            print(f" 失败: {e}")
+
+    save_asr_profile(profile)
+    print(f"--- 校准完成，共 {len(results)} 个配置，档案已保存到: {asr_profile_path()} ---")
+    return profile
+
 def transcribe_audio_with_faster_whisper(audio_path, device, compute_type):
 
     print("\n--- 正在使用 faster-whisper 进行音频转文字 ---")
-    if not os.path.exists(FASTER_WHISPER_MODEL_PATH):
-        print(f"!!! 错误: faster-whisper模型路径不存在: {FASTER_WHISPER_MODEL_PATH}")
+    profile = select_asr_profile(torch.cuda.is_available())
+    if profile:
+        model_path, device, compute_type = profile["model_path"], profile["device"], profile["compute_type"]
+        model_kwargs = {"cpu_threads": profile["cpu_threads"]}
+        beam_size = profile["beam_size"]
+        print(f"使用本机校准档案: 模型 {profile['model']}，beam={beam_size}，"
+              f"threads={profile['cpu_threads']} (RTF={profile['rtf']})")
+    else:
+        model_path, model_kwargs, beam_size = FASTER_WHISPER_MODEL_PATH, {}, 5
+    if not os.path.exists(model_path):
+        print(f"!!! 错误: faster-whisper模型路径不存在: {model_path}")
         return None
     print(f"正在加载本地模型到 {device} (计算类型: {compute_type})...")
     try:
-        model = WhisperModel(FASTER_WHISPER_MODEL_PATH, device=device, compute_type=compute_type)
+        model = WhisperModel(model_path, device=device, compute_type=compute_type, **model_kwargs)
     except Exception as e:
         print(f"!!! 加载模型失败: {e}")
         return None
     print("开始转录...")
-    segments_generator, info = model.transcribe(audio_path, language="zh", word_timestamps=True)
+    segments_generator, info = model.transcribe(audio_path, beam_size=beam_size, **ASR_TRANSCRIBE_OPTIONS)
     whisper_data, total_segments = {"segments": [], "language": info.language}, 0
     for segment in segments_generator:
         total_segments += 1
@@ -282,6 +433,16 @@ def main_pipeline(video_url, device, compute_type):
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--calibrate":
+        # 用法: --calibrate [音频文件] [--workers N]
+        args = sys.argv[2:]
+        concurrency = None
+        if "--workers" in args:
+            i = args.index("--workers")
+            concurrency = int(args[i + 1])
+            del args[i:i + 2]
+        calibrate_asr_profiles(args[0] if args else None, concurrency)
+        sys.exit(0)
     url = sys.argv[1] if len(sys.argv) > 1 else input("请输入B站教学视频链接: ")
     if url.strip():
         main_pipeline(url, device=DEVICE, compute_type=COMPUTE_TYPE)
@@ -0,0 +1,28 @@
+# 让 tests/ 下的测试可以直接 import 项目根目录的模块
+import os
+
+import pytest
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """在临时目录中运行，output/ 等相对路径都指向这里。"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("output")
+    return tmp_path
+
+
+@pytest.fixture
+def write_note(workspace):
+    """按 process_and_generate_final_note 的格式在 output/ 下写一份笔记，讲稿为None时写入占位文字。"""
+    def write(title, speeches, mtime=None):
+        path = os.path.join("output", f"{title}_笔记.md")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"# {title} - 教学笔记 (精炼版)\n\n---\n\n")
+            for i, speech in enumerate(speeches):
+                f.write(f"## Slide {i+1} (时间点: 00:00:{i:02d})\n\n![Slide {i+1}](./images/{title}/00.00.{i:02d}.jpg)\n\n")
+                f.write(f"> {(speech or '(此时间段内无教师讲稿)').replace(chr(10), chr(10) + '> ')}\n\n---\n\n")
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+    return write
@@ -0,0 +1,434 @@
+import os
+import re
+import sys
+import math
+import glob
+import time
+import heapq
+import pickle
+import hashlib
+import threading
+from array import array
+
+# 全局配置区
+OUTPUT_DIR = "output"
+NOTE_SUFFIX = "_笔记.md"
+INDEX_DIR = os.path.join(OUTPUT_DIR, "search_index")  # 每份笔记一个索引分段文件
+INDEX_VERSION = 2
+# 合并后的内存索引快照，只是加载缓存：新进程先读快照，再补上快照之后变化的分段
+SNAPSHOT_FILE = "snapshot.bin"
+SNAPSHOT_MIN_PENDING = 50   # 快照之后至少累积这么多（且不少于笔记数10%的）分段变化才重写快照
+SNAPSHOT_FIELDS = ("slides", "lengths", "notes", "file_stamps", "live_count", "total_length")
+EMPTY_SPEECH = "(此时间段内无教师讲稿)"
+SNIPPET_RADIUS = 40
+# 出现在超过这个比例页面中的二元组（如“我们”“这个”）区分度很低，查询里有更罕见的二元组时不参与打分
+HIGH_DF_RATIO = 0.3
+HIGH_DF_MIN_SLIDES = 1000   # 页面太少时高频二元组扫描很快，跳过反而漏掉结果
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SLIDE_HEADER_RE = re.compile(r"^## Slide (\d+) \(时间点: ([\d:]+)\)")
+IMAGE_RE = re.compile(r"^!\[[^\]]*\]\(([^)]+)\)")
+TOKEN_RUN_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    """转为小写并按非文字字符切分成若干段，二元组不会跨越标点和空白。"""
+    return TOKEN_RUN_RE.findall(text.lower())
+
+
+def bigrams(text):
+    """字符二元组切分：中文不需要分词，英文和数字同样适用。单字的段保留为一元组。"""
+    grams = []
+    for run in normalize(text):
+        if len(run) == 1:
+            grams.append(run)
+        else:
+            grams.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def parse_note(md_path):
+    """把生成的笔记解析成逐页的 {slide, timestamp, image, text} 列表。"""
+    slides, current = [], None
+    with open(md_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            header = SLIDE_HEADER_RE.match(line)
+            if header:
+                current = {"slide": int(header.group(1)), "timestamp": header.group(2), "image": None, "lines": []}
+                slides.append(current)
+            elif current is None:
+                continue
+            elif line.startswith('>'):
+                current["lines"].append(line[1:].strip())
+            elif current["image"] is None and IMAGE_RE.match(line):
+                current["image"] = os.path.normpath(IMAGE_RE.match(line).group(1)).replace("\\", "/")
+    for slide in slides:
+        text = "\n".join(l for l in slide.pop("lines") if l).strip()
+        slide["text"] = "" if text == EMPTY_SPEECH else text
+    return slides
+
+
+def note_title(md_path):
+    return os.path.basename(md_path)[:-len(NOTE_SUFFIX)]
+
+
+def build_segment(md_path):
+    """为一份笔记生成索引分段：逐页元数据（不含讲稿全文）和以页序号为编号的倒排表。"""
+    slides, postings = [], {}
+    for slide in parse_note(md_path):
+        grams = bigrams(slide["text"])
+        if not grams:
+            continue
+        local_id = len(slides)
+        slides.append({"slide": slide["slide"], "timestamp": slide["timestamp"],
+                       "image": slide["image"], "length": len(grams)})
+        counts = {}
+        for gram in grams:
+            counts[gram] = counts.get(gram, 0) + 1
+        for gram, tf in counts.items():
+            postings.setdefault(gram, array('I')).extend((local_id, tf))
+    return {"version": INDEX_VERSION, "title": note_title(md_path), "mtime": os.path.getmtime(md_path),
+            "slides": slides, "postings": postings}
+
+
+def segment_filename(title):
+    # 标题可能很长，用哈希作文件名
+    return hashlib.sha1(title.encode('utf-8')).hexdigest() + ".pkl"
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class NoteSearchIndex:
+    """笔记讲稿的字符二元组倒排索引。
+
+    磁盘上每份笔记是一个独立的分段文件，写入一份笔记只替换它自己的分段，多个进程之间不会互相覆盖；
+    其他进程只需加载变化了的分段。内存中把各分段合并为 bigram -> array('I')，按 (slide_id, tf) 交错存放，
+    更新笔记时旧页面只做删除标记，墓碑过多时再整体压缩。讲稿全文不进索引，摘要按需从笔记文件读取。
+    """
+
+    def __init__(self, index_dir=None, output_dir=None):
+        self.index_dir = index_dir or INDEX_DIR
+        self.output_dir = output_dir or OUTPUT_DIR
+        self.slides = []          # slide_id -> 页面元数据，已删除的为None
+        self.lengths = array('I') # slide_id -> 二元组数，已删除的为0
+        self.postings = {}        # bigram -> array('I', [slide_id, tf, slide_id, tf, ...])
+        self.df = {}              # bigram -> 仍然有效的页面数
+        self.notes = {}           # 笔记标题 -> {"mtime", "start", "count", "grams", "gram_slides"}
+        self.file_stamps = {}     # 分段文件名 -> (mtime_ns, size)，用来发现其他进程写入的分段
+        self.live_count = 0
+        self.total_length = 0
+        self.pending = 0          # 快照之后变化的分段数
+        self.lock = threading.RLock()
+
+    # --- 内存索引 ---
+    def _remove_note(self, title):
+        old = self.notes.pop(title, None)
+        if not old:
+            return
+        for slide_id in range(old["start"], old["start"] + old["count"]):
+            self.total_length -= self.lengths[slide_id]
+            self.slides[slide_id], self.lengths[slide_id] = None, 0
+        self.live_count -= old["count"]
+        df = self.df
+        for gram, n in zip(old["grams"].split("\n"), old["gram_slides"]):
+            if df[gram] == n:
+                del df[gram]
+            else:
+                df[gram] -= n
+
+    def _add_segment(self, segment):
+        title = segment["title"]
+        with self.lock:
+            self._remove_note(title)
+            base = len(self.slides)
+            for meta in segment["slides"]:
+                self.slides.append(dict(meta, note=title))
+                self.lengths.append(meta["length"])
+                self.total_length += meta["length"]
+            postings, df, gram_slides = self.postings, self.df, array('I')
+            for gram, entries in segment["postings"].items():
+                n = len(entries) // 2
+                if base:
+                    entries = array('I', entries)
+                    entries[0::2] = array('I', [slide_id + base for slide_id in entries[0::2]])
+                merged = postings.get(gram)
+                if merged is None:
+                    postings[gram] = array('I', entries)
+                else:
+                    merged.extend(entries)
+                df[gram] = df.get(gram, 0) + n
+                gram_slides.append(n)
+            # 每份笔记的二元组拼成一个字符串（二元组里不会有换行），删除笔记时用来回退 df
+            self.notes[title] = {"mtime": segment["mtime"], "start": base, "count": len(segment["slides"]),
+                                 "grams": "\n".join(segment["postings"]), "gram_slides": gram_slides}
+            self.live_count += len(segment["slides"])
+            self.pending += 1
+            if self._needs_compaction():
+                self._compact()
+
+    def _needs_compaction(self):
+        return len(self.slides) > 2 * max(self.live_count, 1000)
+
+    def _compact(self):
+        """丢弃墓碑并重新编号，slide_id 保持升序，每份笔记的页面仍然连续。"""
+        remap, slides, lengths = array('i', [-1]) * len(self.slides), [], array('I')
+        for old_id, slide in enumerate(self.slides):
+            if slide is not None:
+                remap[old_id] = len(slides)
+                slides.append(slide)
+                lengths.append(self.lengths[old_id])
+        postings = {}
+        for gram, entries in self.postings.items():
+            kept = array('I')
+            for i in range(0, len(entries), 2):
+                new_id = remap[entries[i]]
+                if new_id >= 0:
+                    kept.extend((new_id, entries[i + 1]))
+            if kept:
+                postings[gram] = kept
+        for info in self.notes.values():
+            info["start"] = remap[info["start"]] if info["count"] else 0
+        self.slides, self.lengths, self.postings = slides, lengths, postings
+
+    # --- 分段读写 ---
+    def _segment_path(self, title):
+        return os.path.join(self.index_dir, segment_filename(title))
+
+    def update_note(self, md_path):
+        """重建一份笔记的分段并写入磁盘。"""
+        segment = build_segment(md_path)
+        path = self._segment_path(segment["title"])
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(segment, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # 在替换前取时间戳：若随后又被其他进程改写，时间戳对不上，下次 refresh 会重新加载
+        stamp = _file_stamp(tmp_path)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self._add_segment(segment)
+            self.file_stamps[os.path.basename(path)] = stamp
+
+    def remove_note(self, title):
+        path = self._segment_path(title)
+        with self.lock:
+            self._remove_note(title)
+            self.file_stamps.pop(os.path.basename(path), None)
+            self.pending += 1
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def refresh(self):
+        """加载磁盘上新增或被其他进程改写的分段，并移除已删除的分段。返回是否有变化。"""
+        changed, seen = False, set()
+        if not self.file_stamps:
+            changed = self.load_snapshot()
+        try:
+            entries = list(os.scandir(self.index_dir))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if not entry.name.endswith(".pkl"):
+                continue
+            seen.add(entry.name)
+            st = entry.stat()
+            stamp = (st.st_mtime_ns, st.st_size)
+            if self.file_stamps.get(entry.name) == stamp:
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    segment = pickle.load(f)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                continue
+            if segment.get("version") != INDEX_VERSION:
+                continue
+            with self.lock:
+                self._add_segment(segment)
+                self.file_stamps[entry.name] = stamp
+            changed = True
+        with self.lock:
+            for title in [t for t in self.notes if segment_filename(t) not in seen]:
+                self._remove_note(title)
+                self.file_stamps.pop(segment_filename(title), None)
+                self.pending += 1
+                changed = True
+        return changed
+
+    # --- 快照 ---
+    def load_snapshot(self):
+        try:
+            with open(os.path.join(self.index_dir, SNAPSHOT_FILE), 'rb') as f:
+                state = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return False
+        if state.get("version") != INDEX_VERSION:
+            return False
+        # 快照是压缩过的，没有墓碑，df 就是每个倒排表的页面数
+        postings, df, start, entries = {}, {}, 0, state["entries"]
+        for gram, end in zip(state["grams"].split("\n"), state["bounds"]):
+            postings[gram] = entries[start:end]
+            df[gram] = (end - start) // 2
+            start = end
+        with self.lock:
+            for name in SNAPSHOT_FIELDS:
+                setattr(self, name, state[name])
+            self.postings, self.df = postings, df
+            self.pending = 0
+        return True
+
+    def save_snapshot(self):
+        """把合并后的索引写成快照。快照只是缓存，多个进程先后写入时谁覆盖谁都不影响正确性。"""
+        with self.lock:
+            if len(self.slides) > self.live_count:
+                self._compact()
+            # 倒排表拼成一个大数组保存，比逐个 pickle 上百万个小数组快得多
+            entries, bounds = array('I'), array('Q')
+            for part in self.postings.values():
+                entries.extend(part)
+                bounds.append(len(entries))
+            state = {name: getattr(self, name) for name in SNAPSHOT_FIELDS}
+            state.update(version=INDEX_VERSION, grams="\n".join(self.postings), bounds=bounds, entries=entries)
+            data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+            self.pending = 0
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = os.path.join(self.index_dir, SNAPSHOT_FILE)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def snapshot_due(self):
+        return self.pending >= max(SNAPSHOT_MIN_PENDING, len(self.notes) // 10)
+
+    def sync(self):
+        """增量同步：只重建修改过的笔记，并移除已被删除的笔记。返回是否有变化。"""
+        changed, seen = False, set()
+        for md_path in glob.glob(os.path.join(self.output_dir, f"*{NOTE_SUFFIX}")):
+            title = note_title(md_path)
+            seen.add(title)
+            known = self.notes.get(title)
+            if known is None or known["mtime"] != os.path.getmtime(md_path):
+                self.update_note(md_path)
+                changed = True
+        for title in set(self.notes) - seen:
+            self.remove_note(title)
+            changed = True
+        return changed
+
+    # --- 查询 ---
+    def search(self, query, limit=20, offset=0):
+        with self.lock:
+            grams = [g for g in dict.fromkeys(bigrams(query)) if g in self.df]
+            if not grams:
+                return 0, []
+            n = max(self.live_count, 1)
+            avg_length = self.total_length / n if self.total_length else 1.0
+            # 有罕见二元组时跳过高频二元组；全是高频二元组时只用其中最罕见的一个
+            grams.sort(key=self.df.get)
+            scored = grams
+            if n >= HIGH_DF_MIN_SLIDES:
+                scored = [g for g in grams if self.df[g] <= HIGH_DF_RATIO * n] or grams[:1]
+            lengths, scores, matched, multi = self.lengths, {}, {}, len(scored) > 1
+            norm_base, norm_scale = BM25_K1 * (1 - BM25_B), BM25_K1 * BM25_B / avg_length
+            for gram in scored:
+                df = self.df[gram]
+                weight = math.log(1 + (n - df + 0.5) / (df + 0.5)) * (BM25_K1 + 1)
+                entries = self.postings[gram]
+                for slide_id, tf in zip(entries[0::2], entries[1::2]):
+                    length = lengths[slide_id]
+                    if length:
+                        scores[slide_id] = scores.get(slide_id, 0.0) + weight * tf / (tf + norm_base + norm_scale * length)
+                        if multi:
+                            matched[slide_id] = matched.get(slide_id, 0) + 1
+            # 覆盖全部参与打分的二元组的页面排在前面，其余按BM25得分排序
+            if matched:
+                top = heapq.nlargest(offset + limit, scores, key=lambda s: (matched[s], scores[s]))[offset:]
+            else:
+                top = heapq.nlargest(offset + limit, scores, key=scores.get)[offset:]
+            hits = [(self.slides[s], scores[s]) for s in top]
+
+        texts = {}
+        results = []
+        for slide, score in hits:
+            if slide["note"] not in texts:
+                texts[slide["note"]] = self._slide_texts(slide["note"])
+            results.append({
+                "note": slide["note"],
+                "slide": slide["slide"],
+                "timestamp": slide["timestamp"],
+                "image": slide["image"],
+                "score": round(score, 4),
+                "snippet": make_snippet(texts[slide["note"]].get(slide["slide"], ""), query),
+            })
+        return len(scores), results
+
+    def _slide_texts(self, title):
+        try:
+            return {s["slide"]: s["text"] for s in parse_note(os.path.join(self.output_dir, f"{title}{NOTE_SUFFIX}"))}
+        except FileNotFoundError:
+            return {}
+
+
+def make_snippet(text, query, radius=SNIPPET_RADIUS):
+    """截取命中位置附近的文字；整句未命中时退而定位第一个命中的二元组。"""
+    lowered = text.lower()
+    pos = lowered.find(query.strip().lower())
+    if pos < 0:
+        pos = next((p for p in (lowered.find(g) for g in bigrams(query)) if p >= 0), 0)
+    start, end = max(0, pos - radius), min(len(text), pos + len(query) + radius)
+    snippet = text[start:end].replace("\n", " ")
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+
+_index = None
+_index_dir_stamp = None   # 上次加载分段时索引目录的版本
+_output_stamp = None      # 上次同步时 output 目录的版本
+_index_lock = threading.Lock()
+
+def get_index():
+    """进程内共享的索引。索引目录有变化时加载其他进程写入的分段；output 目录有增删时增量同步。"""
+    global _index, _index_dir_stamp, _output_stamp
+    with _index_lock:
+        if _index is None:
+            _index = NoteSearchIndex()
+        stamp = _file_stamp(INDEX_DIR)
+        if stamp != _index_dir_stamp:
+            _index.refresh()
+            _index_dir_stamp = stamp
+        stamp = _file_stamp(OUTPUT_DIR)
+        if stamp != _output_stamp:
+            _index.sync()
+            _output_stamp = stamp
+        if _index.snapshot_due():
+            _index.save_snapshot()
+            _index_dir_stamp = _file_stamp(INDEX_DIR)
+        return _index
+
+def index_note(md_path):
+    """笔记生成后调用，只重建并写入这一份笔记的分段。"""
+    index = get_index()
+    known = index.notes.get(note_title(md_path))
+    if known is None or known["mtime"] != os.path.getmtime(md_path):
+        index.update_note(md_path)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    index = get_index()
+    print(f"索引已就绪: {len(index.notes)} 份笔记，{index.live_count} 页，耗时 {time.perf_counter() - start:.2f}s")
+    if len(sys.argv) > 1:
+        total, results = index.search(" ".join(sys.argv[1:]))
+        print(f"共 {total} 条结果")
+        for r in results:
+            print(f"[{r['note']}] Slide {r['slide']} ({r['timestamp']})  {r['snippet']}")
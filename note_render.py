@@ -0,0 +1,196 @@
+import os
+import re
+import gzip
+import html
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+import markdown
+try:
+    import brotli # 可选，支持时优先使用br压缩
+except ImportError:
+    brotli = None
+
+# 全局配置区
+OUTPUT_DIR = "output"
+NOTE_SUFFIX = "_笔记.md"
+IMAGE_URL_PREFIX = "/notes/images/"
+SLIDES_PER_PAGE = 20
+PAGE_SIZES = (10, 20, 50)   # 允许的每页幻灯片数，其他取值按默认值处理，避免缓存被任意分页撑大
+RENDER_CACHE_SIZE = 64      # 最多缓存多少份笔记的解析和逐页渲染结果
+BODY_CACHE_BYTES = 64 * 1024 * 1024  # 组装好的页面及其压缩版本的缓存上限（字节）
+MIN_COMPRESS_BYTES = 1024   # 太小的响应压缩得不偿失
+
+SLIDE_SPLIT_RE = re.compile(r"^(?=## Slide \d+)", re.MULTILINE)
+IMG_SRC_RE = re.compile(r'<img([^>]*?) src="\./images/([^"]+)"')
+URL_ATTR_RE = re.compile(r'\b(href|src)="([^"]*)"')
+URL_SCHEME_RE = re.compile(r'^([a-z][a-z0-9+.-]*):')
+SAFE_URL_SCHEMES = ("http", "https", "mailto")
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ max-width: 960px; margin: 0 auto; padding: 1em; font-family: sans-serif; line-height: 1.7; }}
+img {{ max-width: 100%; height: auto; }}
+blockquote {{ margin: 0; padding-left: 1em; border-left: 4px solid #ddd; color: #444; }}
+nav {{ display: flex; justify-content: space-between; margin: 1em 0; }}
+</style>
+</head>
+<body>
+{body}
+<nav>{prev_link}<span>第 {page} / {total_pages} 页</span>{next_link}</nav>
+</body>
+</html>
+"""
+
+
+def note_path(title):
+    """笔记标题对应的Markdown路径；标题含路径分隔符等非法字符时返回None。"""
+    if not title or title != os.path.basename(title) or title.startswith('.'):
+        return None
+    return os.path.join(OUTPUT_DIR, f"{title}{NOTE_SUFFIX}")
+
+
+def _safe_url_attr(match):
+    # 先还原实体再判断协议，防止 jav&#x61;script: 这类写法绕过
+    url = re.sub(r'[\x00-\x20]', '', html.unescape(match.group(2))).lower()
+    scheme = URL_SCHEME_RE.match(url)
+    if scheme and scheme.group(1) not in SAFE_URL_SCHEMES:
+        return f'{match.group(1)}="#"'
+    return match.group(0)
+
+
+_markdown_local = threading.local()
+
+def _markdown():
+    # Markdown 实例不是线程安全的，创建又比渲染一页还慢，所以每个线程复用一个
+    md = getattr(_markdown_local, "md", None)
+    if md is None:
+        md = markdown.Markdown(output_format="html")
+        # 不识别原始HTML：HTML块和行内标签都按普通文本转义，代码片段里的 '<' 也只转义一次
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        _markdown_local.md = md
+    return md.reset()
+
+
+def render_markdown(text):
+    """渲染Markdown，把笔记里的相对图片路径改写为图片接口地址，并让图片懒加载。
+
+    讲稿由大模型改写，可能带有HTML代码片段，因此原始HTML一律按文本显示，
+    渲染后把非 http/https/mailto 协议的链接替换掉。
+    """
+    rendered = _markdown().convert(text)
+    rendered = URL_ATTR_RE.sub(_safe_url_attr, rendered)
+    return IMG_SRC_RE.sub(lambda m: f'<img loading="lazy"{m.group(1)} src="{IMAGE_URL_PREFIX}{quote(m.group(2))}"', rendered)
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class NoteRenderCache:
+    """按笔记文件的 mtime/size 和内容哈希缓存渲染结果。
+
+    每份笔记的每页幻灯片只渲染一次，分页时直接拼接；组装好的页面和压缩结果另按字节数做LRU淘汰。
+    文件只被 touch 而内容未变时，哈希相同，已有的渲染结果继续复用。
+    """
+
+    def __init__(self, max_notes=RENDER_CACHE_SIZE, max_body_bytes=BODY_CACHE_BYTES):
+        self.entries = OrderedDict()  # 标题 -> {"stat", "hash", "mtime", "markdown", "header", "slides", "html"}
+        self.bodies = OrderedDict()   # (标题, 哈希, 格式, 页码, 每页数, 压缩方式) -> bytes
+        self.body_bytes = 0
+        self.max_notes = max_notes
+        self.max_body_bytes = max_body_bytes
+        self.lock = threading.Lock()
+
+    def _entry(self, title):
+        path = note_path(title)
+        if path is None or not os.path.isfile(path):
+            return None
+        st = os.stat(path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            entry = self.entries.get(title)
+            if entry is not None and entry["stat"] == stat_key:
+                self.entries.move_to_end(title)
+                return entry
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        with self.lock:
+            entry = self.entries.get(title)
+            if entry is None or entry["hash"] != digest:
+                text = raw.decode('utf-8')
+                header, *slides = SLIDE_SPLIT_RE.split(text)
+                entry = {"hash": digest, "markdown": raw, "header": header, "slides": slides, "html": None}
+            entry.update({"stat": stat_key, "mtime": st.st_mtime})
+            self.entries[title] = entry
+            self.entries.move_to_end(title)
+            while len(self.entries) > self.max_notes:
+                self.entries.popitem(last=False)
+            return entry
+
+    def _slide_html(self, entry):
+        if entry["html"] is None:
+            entry["html"] = (render_markdown(entry["header"]), [render_markdown(slide) for slide in entry["slides"]])
+        return entry["html"]
+
+    def _render_page(self, title, entry, page, per_page):
+        header_html, slides_html = self._slide_html(entry)
+        total_pages = max(1, -(-len(slides_html) // per_page))
+        body = (header_html if page == 1 else "") + "\n".join(slides_html[(page - 1) * per_page:page * per_page])
+        link = lambda p, label: f'<a href="?page={p}&amp;per_page={per_page}">{label}</a>'
+        return PAGE_TEMPLATE.format(
+            title=html.escape(title), body=body, page=page, total_pages=total_pages,
+            prev_link=link(page - 1, "上一页") if page > 1 else "<span></span>",
+            next_link=link(page + 1, "下一页") if page < total_pages else "<span></span>",
+        ).encode('utf-8')
+
+    def _cached_body(self, key, build):
+        with self.lock:
+            body = self.bodies.get(key)
+            if body is not None:
+                self.bodies.move_to_end(key)
+                return body
+        body = build()
+        with self.lock:
+            if key not in self.bodies:
+                self.bodies[key] = body
+                self.body_bytes += len(body)
+            while self.body_bytes > self.max_body_bytes and self.bodies:
+                self.body_bytes -= len(self.bodies.popitem(last=False)[1])
+        return body
+
+    def get(self, title, fmt="html", page=1, per_page=SLIDES_PER_PAGE, encoding=None):
+        """返回 (body, etag, mtime, content_encoding)；笔记不存在时返回None。encoding 为 'br'/'gzip'/None。"""
+        entry = self._entry(title)
+        if entry is None:
+            return None
+        if fmt == "md":
+            key = ("md",)
+        else:
+            if per_page not in PAGE_SIZES:
+                per_page = SLIDES_PER_PAGE
+            total_pages = max(1, -(-len(entry["slides"]) // per_page))
+            page = min(max(page, 1), total_pages)
+            key = ("html", page, per_page)
+            build = lambda: self._render_page(title, entry, page, per_page)
+        etag = f"{entry['hash'][:16]}-{'-'.join(map(str, key))}"
+        cache_key = (title, entry["hash"]) + key
+
+        body = entry["markdown"] if fmt == "md" else self._cached_body(cache_key + (None,), build)
+        if encoding and len(body) >= MIN_COMPRESS_BYTES:
+            encoded = self._cached_body(cache_key + (encoding,), lambda: compress(body, encoding))
+            return encoded, f"{etag}-{encoding}", entry["mtime"], encoding
+        return body, etag, entry["mtime"], None
+
+def supported_encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
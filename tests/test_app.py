@@ -0,0 +1,82 @@
+import gzip
+import os
+import sys
+import types
+from email.utils import formatdate
+
+import pytest
+
+from note_render import NoteRenderCache
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    # 笔记接口用不到转录流水线，替换掉 auto_note_generator，避免导入 torch 和 faster-whisper
+    pipeline = types.ModuleType("auto_note_generator")
+    pipeline.DEVICE, pipeline.COMPUTE_TYPE = "cpu", "int8"
+    pipeline.transcribe_audio_with_faster_whisper = pipeline.process_and_generate_final_note = None
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setitem(sys.modules, "auto_note_generator", pipeline)
+        mp.delitem(sys.modules, "app", raising=False)
+        import app
+        yield app
+
+
+@pytest.fixture
+def client(app_module, workspace, monkeypatch):
+    monkeypatch.setattr(app_module, "note_cache", NoteRenderCache())
+    return app_module.app.test_client()
+
+
+def test_note_etag_and_last_modified_revalidation(client, write_note):
+    write_note("课程", ["反馈控制"], mtime=1000000000)
+    response = client.get("/notes/课程")
+    assert response.status_code == 200 and "反馈控制" in response.get_data(as_text=True)
+    assert "no-cache" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+
+    assert client.get("/notes/课程", headers={"If-None-Match": etag}).status_code == 304
+    since = formatdate(1000000000, usegmt=True)
+    assert client.get("/notes/课程", headers={"If-Modified-Since": since}).status_code == 304
+    assert client.get("/notes/课程/raw", headers={"If-None-Match": etag}).status_code == 200
+
+    write_note("课程", ["根轨迹"], mtime=1000000100)
+    assert client.get("/notes/课程", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_note_compression_headers(client, write_note):
+    write_note("课程", ["讲稿内容" * 200] * 5)
+    response = client.get("/notes/课程", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert "讲稿内容" in gzip.decompress(response.get_data()).decode()
+
+    plain = client.get("/notes/课程/raw")
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+    assert plain.mimetype == "text/markdown"
+
+
+def test_image_range_request(client):
+    os.makedirs(os.path.join("output", "images", "课程"))
+    with open(os.path.join("output", "images", "课程", "00.00.01.jpg"), 'wb') as f:
+        f.write(bytes(range(256)))
+    response = client.get("/notes/images/课程/00.00.01.jpg", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.get_data() == bytes(range(10, 20))
+    assert response.headers["Content-Range"] == "bytes 10-19/256"
+
+
+@pytest.mark.parametrize("url", [
+    "/notes/..%2F..%2Fapp",
+    "/notes/.hidden",
+    "/notes/images/../../app.py",
+    "/notes/images/..%2F..%2Fapp.py",
+])
+def test_path_traversal_is_rejected(client, write_note, url):
+    write_note("课程", ["反馈控制"])
+    with open("app.py", 'w') as f:
+        f.write("secret")
+    response = client.get(url)
+    assert response.status_code == 404
+    assert b"secret" not in response.get_data()
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+import asr_profile
+from asr_profile import asr_candidate_configs, parse_asr_target, select_asr_profile
+
+
+def config(rtf, memory, device="cpu", num_workers=1, model_path="."):
+    return {"model": "small", "model_path": model_path, "device": device, "compute_type": "int8",
+            "cpu_threads": 0, "num_workers": num_workers, "beam_size": 1, "rtf": rtf, "peak_memory_mb": memory}
+
+
+@pytest.fixture
+def profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(asr_profile, "ASR_PROFILE_DIR", str(tmp_path))
+    def write(*results):
+        with open(asr_profile.asr_profile_path(), 'w', encoding='utf-8') as f:
+            json.dump({"results": list(results)}, f)
+    return write
+
+
+def selected_rtf(**targets):
+    return select_asr_profile(False, **{"max_rtf": None, "max_memory_mb": None, **targets})["rtf"]
+
+
+def test_no_profile_returns_none(profile):
+    assert select_asr_profile(False) is None
+
+
+def test_no_targets_picks_fastest(profile):
+    profile(config(0.5, 500), config(0.2, 1000))
+    assert selected_rtf() == 0.2
+
+
+def test_rtf_target_only(profile):
+    profile(config(0.2, 1000), config(0.4, 500))
+    assert selected_rtf(max_rtf=0.3) == 0.2
+    assert selected_rtf(max_rtf=0.1) == 0.2  # 都达不到时用最快的
+
+
+def test_memory_target_only(profile):
+    profile(config(0.2, 1000), config(0.4, 500), config(0.9, 300))
+    assert selected_rtf(max_memory_mb=600) == 0.4
+    assert selected_rtf(max_memory_mb=100) == 0.9  # 都放不下时用内存最小的
+
+
+def test_both_targets(profile, capsys):
+    profile(config(0.2, 1000), config(0.9, 500))
+    assert selected_rtf(max_rtf=0.5, max_memory_mb=4096) == 0.2
+    # 内存满足、速度不满足：用满足内存目标的配置里最快的，只提示速度目标
+    assert selected_rtf(max_rtf=0.1, max_memory_mb=4096) == 0.2
+    out = capsys.readouterr().out
+    assert "速度目标" in out and "没有配置满足内存目标" not in out
+    assert selected_rtf(max_rtf=0.1, max_memory_mb=600) == 0.9
+
+
+def test_unmeasured_memory_warns(profile, capsys):
+    profile(config(0.2, None), config(0.4, 500))
+    assert selected_rtf(max_memory_mb=100) == 0.2
+    assert "psutil" in capsys.readouterr().out
+
+
+def test_skips_multi_worker_cuda_and_missing_models(profile):
+    profile(config(0.1, 100, num_workers=2), config(0.15, 100, device="cuda"),
+            config(0.05, 100, model_path="/nonexistent"), config(0.3, 100))
+    assert selected_rtf() == 0.3
+    assert select_asr_profile(True, max_rtf=None, max_memory_mb=None)["rtf"] == 0.15
+
+
+@pytest.mark.parametrize("value, expected", [("0.5", 0.5), ("4096", 4096.0), ("", None), ("abc", None), ("1,5", None)])
+def test_parse_asr_target(monkeypatch, capsys, value, expected):
+    monkeypatch.setenv("ASR_MAX_RTF", value)
+    assert parse_asr_target("ASR_MAX_RTF") == expected
+    assert ("警告" in capsys.readouterr().out) == (value not in ("", "0.5", "4096"))
+
+
+def test_parse_asr_target_unset(monkeypatch):
+    monkeypatch.delenv("ASR_MAX_MEMORY_MB", raising=False)
+    assert parse_asr_target("ASR_MAX_MEMORY_MB") is None
+
+
+def test_candidate_configs(tmp_path, capsys):
+    configs = list(asr_candidate_configs({"small": str(tmp_path), "large": "/nonexistent"}, False, cpu_count=8))
+    assert {c["model"] for c in configs} == {"small"}
+    assert {c["num_workers"] for c in configs} == {1}
+    assert {c["cpu_threads"] for c in configs} == {0, 4, 8}
+    assert len(configs) == 2 * 3 * 2  # 计算类型 × 线程数 × beam
+    assert "large" in capsys.readouterr().out
+
+    with_cuda = list(asr_candidate_configs({"small": str(tmp_path)}, True, cpu_count=1))
+    assert {c["device"] for c in with_cuda} == {"cpu", "cuda"}
+    assert len([c for c in with_cuda if c["device"] == "cpu"]) == 2 * 2 * 2  # threads {0, 1}
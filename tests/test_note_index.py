@@ -0,0 +1,173 @@
+import os
+import pickle
+
+import pytest
+
+import note_index
+from note_index import NoteSearchIndex, bigrams, parse_note
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(workspace, monkeypatch):
+    monkeypatch.setattr(note_index, "_index", None)
+    monkeypatch.setattr(note_index, "_index_dir_stamp", None)
+    monkeypatch.setattr(note_index, "_output_stamp", None)
+
+
+def test_bigrams_split_on_punctuation_and_keep_single_chars():
+    assert bigrams("算术运算") == ["算术", "术运", "运算"]
+    assert bigrams("Py, x") == ["py", "x"]
+
+
+def test_parse_note(write_note):
+    path = write_note("课程", ["第一行\n\n第二行", None])
+    slides = parse_note(path)
+    assert [s["slide"] for s in slides] == [1, 2]
+    assert slides[0]["timestamp"] == "00:00:00"
+    assert slides[0]["image"] == "images/课程/00.00.00.jpg"
+    assert slides[0]["text"] == "第一行\n第二行"
+    assert slides[1]["text"] == ""
+
+
+def test_search_ranks_full_matches_first(write_note):
+    write_note("课程", ["除法的结果一定是小数", "除法除法除法", "今天讲循环"])
+    index = NoteSearchIndex()
+    index.sync()
+    total, results = index.search("除法的结果")
+    assert total == 2
+    assert [r["slide"] for r in results] == [1, 2]
+    assert "除法的结果" in results[0]["snippet"]
+    assert index.search("不存在的词")[0] == 0
+
+
+def test_sync_handles_changed_and_deleted_notes(write_note):
+    path = write_note("甲", ["旧的讲稿"], mtime=1000)
+    write_note("乙", ["另一门课"], mtime=1000)
+    index = NoteSearchIndex()
+    assert index.sync()
+    assert not index.sync()
+
+    write_note("甲", ["新的讲稿"], mtime=2000)
+    os.remove(os.path.join("output", "乙_笔记.md"))
+    assert index.sync()
+    assert index.search("旧的")[0] == 0
+    assert index.search("新的")[1][0]["note"] == "甲"
+    assert index.search("另一")[0] == 0
+    assert index.live_count == 1 and set(index.notes) == {"甲"}
+
+
+def test_compact_remaps_slide_ids(write_note):
+    index = NoteSearchIndex()
+    write_note("甲", ["反馈控制", "根轨迹"])
+    write_note("乙", ["频域分析", "反馈回路"])
+    index.sync()
+    for mtime in (1000, 2000):  # 制造墓碑
+        write_note("甲", ["反馈控制", "根轨迹"], mtime=mtime)
+        index.sync()
+    before = index.search("反馈")
+    assert len(index.slides) > index.live_count
+
+    index._compact()
+    assert len(index.slides) == index.live_count == 4
+    assert index.search("反馈") == before
+    for info in index.notes.values():
+        assert all(index.slides[i] is not None for i in range(info["start"], info["start"] + info["count"]))
+
+
+def test_df_counts_only_live_slides(write_note):
+    index = NoteSearchIndex()
+    write_note("甲", ["反馈控制", "反馈回路"], mtime=1000)
+    write_note("乙", ["反馈系统"])
+    index.sync()
+    assert index.df["反馈"] == 3
+    write_note("甲", ["根轨迹"], mtime=2000)
+    index.sync()
+    assert index.df["反馈"] == 1 and "控制" not in index.df
+    index.remove_note("乙")
+    assert index.df == {"根轨": 1, "轨迹": 1}
+
+
+def test_segments_do_not_store_speech_text(write_note):
+    write_note("甲", ["反馈控制系统的稳定性"])
+    index = NoteSearchIndex()
+    index.sync()
+    with open(index._segment_path("甲"), 'rb') as f:
+        segment = pickle.load(f)
+    assert "稳定性" not in repr(segment["slides"])
+    # 摘要按需从笔记文件读取
+    assert "稳定性" in index.search("稳定")[1][0]["snippet"]
+
+
+def test_high_df_grams_are_skipped_when_rarer_ones_exist(monkeypatch, write_note):
+    monkeypatch.setattr(note_index, "HIGH_DF_MIN_SLIDES", 0)
+    write_note("课程", ["我们讲根轨迹"] + [f"我们第{i}页" for i in range(9)])
+    index = NoteSearchIndex()
+    index.sync()
+    total, results = index.search("我们根轨迹")
+    assert total == 1 and results[0]["slide"] == 1
+    # 只有高频二元组时仍然返回结果
+    assert index.search("我们")[0] == 10
+
+
+def test_refresh_loads_only_changed_segments(write_note):
+    write_note("甲", ["反馈控制"])
+    write_note("乙", ["频域分析"])
+    writer = NoteSearchIndex()
+    writer.sync()
+    reader = NoteSearchIndex()
+    assert reader.refresh()
+    assert reader.search("反馈")[0] == 1
+    assert not reader.refresh()
+
+    writer.update_note(write_note("甲", ["反馈回路"], mtime=2000))
+    writer.remove_note("乙")
+    assert reader.refresh()
+    assert reader.search("回路")[0] == 1
+    assert reader.search("频域")[0] == 0
+    assert set(reader.notes) == {"甲"}
+
+
+def test_snapshot_round_trip_with_later_segments(write_note):
+    write_note("甲", ["反馈控制"], mtime=1000)
+    write_note("乙", ["频域分析"])
+    index = NoteSearchIndex()
+    index.sync()
+    index.update_note(write_note("甲", ["反馈控制"], mtime=2000))  # 制造墓碑
+    index.save_snapshot()
+    assert index.pending == 0 and len(index.slides) == index.live_count
+
+    # 快照之后又有分段变化，新进程加载快照后只补上这些分段
+    index.update_note(write_note("丙", ["反馈回路"]))
+    index.remove_note("乙")
+    loaded = NoteSearchIndex()
+    assert loaded.refresh()
+    assert set(loaded.notes) == {"甲", "丙"}
+    assert loaded.df == index.df
+    assert loaded.search("反馈") == index.search("反馈")
+
+
+def test_get_index_picks_up_other_process_writes(write_note):
+    write_note("甲", ["反馈控制"])
+    assert note_index.get_index().search("反馈")[0] == 1
+
+    # 另一个进程写入了新笔记的分段
+    other = NoteSearchIndex()
+    other.update_note(write_note("乙", ["反馈回路"]))
+    os.utime(note_index.INDEX_DIR, ns=(0, 0))
+    assert note_index.get_index().search("反馈")[0] == 2
+
+    # 本进程随后写入时不会覆盖另一个进程的分段
+    note_index.index_note(write_note("丙", ["反馈系统"]))
+    fresh = NoteSearchIndex()
+    fresh.refresh()
+    assert fresh.search("反馈")[0] == 3
+
+
+def test_get_index_writes_snapshot_after_enough_changes(monkeypatch, write_note):
+    monkeypatch.setattr(note_index, "SNAPSHOT_MIN_PENDING", 2)
+    write_note("甲", ["反馈控制"])
+    note_index.get_index()
+    assert not os.path.exists(os.path.join(note_index.INDEX_DIR, note_index.SNAPSHOT_FILE))
+    write_note("乙", ["频域分析"])
+    assert note_index.get_index().pending == 0
+    assert os.path.exists(os.path.join(note_index.INDEX_DIR, note_index.SNAPSHOT_FILE))
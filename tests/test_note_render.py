@@ -0,0 +1,79 @@
+import gzip
+import os
+
+import pytest
+
+import note_render
+from note_render import NoteRenderCache, render_markdown
+
+
+pytestmark = pytest.mark.usefixtures("workspace")
+
+
+def test_render_rewrites_images_and_lazy_loads():
+    rendered = render_markdown("![Slide 1](./images/课程/00.00.01.jpg)")
+    assert 'loading="lazy"' in rendered
+    assert 'src="/notes/images/%E8%AF%BE%E7%A8%8B/00.00.01.jpg"' in rendered
+
+
+def test_render_escapes_html_and_unsafe_links():
+    rendered = render_markdown(
+        "> <script>alert(1)</script> <img src=x onerror=alert(1)>\n"
+        "> [a](javascript:alert(1)) [b](jav&#x61;script:alert(1)) [c](https://example.com)"
+    )
+    assert "<script" not in rendered and "<img src=x" not in rendered
+    assert "&lt;script&gt;" in rendered
+    assert "javascript" not in rendered and "jav&#x61;script" not in rendered
+    assert 'href="https://example.com"' in rendered
+
+
+def test_render_escapes_code_spans_once():
+    rendered = render_markdown("> 比较 `a < b && c > d` 和 <b>粗体</b>\n\n```\nif a<b: pass\n```")
+    assert "<code>a &lt; b &amp;&amp; c &gt; d</code>" in rendered
+    assert "&lt;b&gt;粗体&lt;/b&gt;" in rendered
+    assert "if a&lt;b: pass" in rendered and "&amp;lt;" not in rendered
+
+
+def test_pages_and_per_page_whitelist(write_note):
+    write_note("课程", [f"第{i}页讲稿" for i in range(25)])
+    cache = NoteRenderCache()
+    body = cache.get("课程", page=2, per_page=10)[0].decode()
+    assert "第10页讲稿" in body and "第19页讲稿" in body and "第9页讲稿" not in body
+    assert "第 2 / 3 页" in body
+    # 不在白名单里的每页数按默认值处理，页码越界时取最后一页
+    assert cache.get("课程", per_page=7)[1] == cache.get("课程", per_page=20)[1]
+    assert "第 2 / 2 页" in cache.get("课程", page=99)[0].decode()
+    assert cache.get("不存在") is None and cache.get("../课程") is None
+
+
+def test_cache_reuses_renders_until_content_changes(monkeypatch, write_note):
+    path = write_note("课程", ["旧讲稿"], mtime=1000)
+    cache = NoteRenderCache()
+    calls = []
+    real_render = note_render.render_markdown
+    monkeypatch.setattr(note_render, "render_markdown", lambda text: calls.append(text) or real_render(text))
+
+    etag = cache.get("课程")[1]
+    rendered = len(calls)
+    assert cache.get("课程")[1] == etag and len(calls) == rendered
+
+    os.utime(path, (2000, 2000))  # 只 touch，内容不变
+    assert cache.get("课程")[1] == etag and len(calls) == rendered
+
+    write_note("课程", ["新讲稿"], mtime=3000)
+    body, new_etag, mtime, _ = cache.get("课程")
+    assert new_etag != etag and "新讲稿" in body.decode() and mtime == 3000
+
+
+def test_compressed_bodies_and_byte_budget(write_note):
+    write_note("课程", ["讲稿内容" * 200] * 30)
+    cache = NoteRenderCache(max_body_bytes=20000)
+    plain = cache.get("课程", per_page=10)[0]
+    body, etag, _, encoding = cache.get("课程", per_page=10, encoding="gzip")
+    assert encoding == "gzip" and etag.endswith("-gzip")
+    assert gzip.decompress(body) == plain
+    for page in (1, 2, 3):
+        for per_page in (10, 20, 50):
+            cache.get("课程", page=page, per_page=per_page, encoding="gzip")
+    assert cache.body_bytes <= 20000
+    assert cache.body_bytes == sum(len(b) for b in cache.bodies.values())